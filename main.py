@@ -2,37 +2,29 @@ import re
 import os
 import csv
 import json
+import shutil
 import requests
+import urllib3
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse
 from yt_dlp import YoutubeDL
 import instaloader
 from dotenv import load_dotenv
+from utils import detect_platform, make_session, parse_og_tags, sanitize_filename
 
 load_dotenv()  # Load environment variables from .env
 
 # -----------------------------
-# Helper Functions
+# HTTP Session
 # -----------------------------
 
-def sanitize_filename(s: str) -> str:
-    """Replace invalid Windows filename characters with underscore."""
-    return re.sub(r'[<>:"/\\|?*]', '_', s)
+SESSION = make_session()
 
-def detect_platform(url: str) -> str:
-    """Detect platform from URL: YouTube, TikTok, Instagram, or unknown."""
-    url = url.strip()
-    if not url:
-        return "unknown"
+# Plain urllib3 pool for raw CDN video downloads, where requests' cookie and
+# hook handling buys nothing.
+POOL = urllib3.PoolManager(maxsize=32, retries=Retry(3), headers=dict(SESSION.headers))
 
-    domain = urlparse(url).netloc.lower()
-
-    if re.search(r"(youtube\.com|youtu\.be)$", domain):
-        return "youtube"
-    if re.search(r"(tiktok\.com)$", domain):
-        return "tiktok"
-    if re.search(r"(instagram\.com)$", domain):
-        return "instagram"
-    return "unknown"
+CHUNK_SIZE = 1024 * 1024  # 1 MiB per read/write when streaming videos to disk
 
 # -----------------------------
 # TikTok Downloader
@@ -49,7 +41,7 @@ def download_tiktok(url: str, rapidapi_key: str, base_dir: str = "./downloads"):
     params = {"videoUrl": url}
 
     print(f"🔍 Fetching TikTok info for {url} ...")
-    resp = requests.get(api_endpoint, headers=headers, params=params)
+    resp = SESSION.get(api_endpoint, headers=headers, params=params)
     resp.raise_for_status()
     data = resp.json()
 
@@ -72,12 +64,14 @@ def download_tiktok(url: str, rapidapi_key: str, base_dir: str = "./downloads"):
         return data, video_path
 
     print(f"⬇️ Downloading TikTok video @{username} ({video_id})...")
-    video_resp = requests.get(video_url, stream=True)
-    video_resp.raise_for_status()
-    with open(video_path, "wb") as f:
-        for chunk in video_resp.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
+    video_resp = POOL.request("GET", video_url, preload_content=False)
+    try:
+        if video_resp.status >= 400:
+            raise RuntimeError(f"TikTok video download failed with HTTP {video_resp.status}")
+        with open(video_path, "wb", buffering=0) as f:
+            shutil.copyfileobj(video_resp, f, CHUNK_SIZE)
+    finally:
+        video_resp.release_conn()
 
     with open(metadata_path, "w", encoding="utf-8") as mf:
         json.dump(data, mf, ensure_ascii=False, indent=2)
@@ -112,8 +106,9 @@ def download_youtube(url: str, base_dir: str = "./downloads"):
     ydl_opts_download = {
         'outtmpl': os.path.join(folder_path, '%(title)s.%(ext)s'),
     }
+    # Reuse the extracted info instead of letting download() extract it again.
     with YoutubeDL(ydl_opts_download) as ydl:
-        ydl.download([url])
+        ydl.process_ie_result(info, download=True)
 
     print(f"✅ YouTube download complete: {video_path}")
     return metadata, video_path
@@ -122,8 +117,18 @@ def download_youtube(url: str, base_dir: str = "./downloads"):
 # Instagram Downloader
 # -----------------------------
 
-def download_instagram(url: str, L=None, base_dir: str = "./downloads"):
-    if L is None:
+# og:description looks like: '282 likes, 188 comments - user.name on October 6, 2025: "caption"'
+IG_DESCRIPTION_RE = re.compile(
+    r'^([\d.,]+[KkMm]?) likes?, ([\d.,]+[KkMm]?) comments? - (\S+) on [^:]+: "(.*)"\.?$',
+    re.DOTALL,
+)
+
+_instaloader = None
+
+def get_instaloader():
+    """Build the shared Instaloader on first use, logging in if credentials are set."""
+    global _instaloader
+    if _instaloader is None:
         L = instaloader.Instaloader(
             download_pictures=False,
             download_videos=False,
@@ -132,31 +137,83 @@ def download_instagram(url: str, L=None, base_dir: str = "./downloads"):
             download_comments=False,
             save_metadata=False
         )
+        USERNAME = os.getenv("INSTA_USERNAME")
+        PASSWORD = os.getenv("INSTA_PASSWORD")
+        if USERNAME and PASSWORD:
+            L.login(USERNAME, PASSWORD)
+        _instaloader = L
+    return _instaloader
+
+def _count(value: str):
+    """Turn '1,234' into 1234; abbreviated counts like '12K' are kept as text."""
+    digits = value.replace(",", "")
+    return int(digits) if digits.isdigit() else value
 
-    shortcode = url.strip("/").split("/")[-1]
-    post = instaloader.Post.from_shortcode(L.context, shortcode)
+def fetch_instagram_post(url: str):
+    """Read video URL and post details from the reel's Open Graph tags.
 
-    folder_name = sanitize_filename(f"{post.owner_username}_{shortcode}")
+    Returns None when the page lacks a video or a parseable description.
+    """
+    try:
+        r = SESSION.get(url, timeout=10)
+        r.raise_for_status()
+    except requests.RequestException:
+        return None
+
+    og = parse_og_tags(r.content)
+    video_url = og.get("og:video:secure_url") or og.get("og:video")
+    match = IG_DESCRIPTION_RE.match(og.get("og:description", ""))
+    if not video_url or not match:
+        return None
+
+    likes, comments, username, caption = match.groups()
+    return {
+        "username": username,
+        "caption": caption,
+        "likes": _count(likes),
+        "comments": _count(comments),
+        "video_url": video_url,
+    }
+
+def download_instagram(url: str, L=None, base_dir: str = "./downloads"):
+    shortcode = urlparse(url).path.strip("/").split("/")[-1]
+
+    # Open Graph scrape first: no login and no GraphQL round-trip.
+    post = fetch_instagram_post(url)
+    if post is None:
+        print("ℹ️ Open Graph tags incomplete, falling back to instaloader.")
+        if L is None:
+            L = get_instaloader()
+        ig_post = instaloader.Post.from_shortcode(L.context, shortcode)
+        post = {
+            "username": ig_post.owner_username,
+            "caption": ig_post.caption,
+            "likes": ig_post.likes,
+            "comments": ig_post.comments,
+            "video_url": ig_post.video_url,
+        }
+
+    folder_name = sanitize_filename(f"{post['username']}_{shortcode}")
     folder_path = os.path.join(base_dir, 'instagram', folder_name)
     os.makedirs(folder_path, exist_ok=True)
 
-    video_filename = sanitize_filename(f"{post.owner_username}_{shortcode}.mp4")
+    video_filename = sanitize_filename(f"{post['username']}_{shortcode}.mp4")
     video_path = os.path.join(folder_path, video_filename)
     if os.path.exists(video_path):
         print(f"⚠️ Instagram video already exists: {video_path}. Skipping download.")
         return
 
-    with requests.get(post.video_url, stream=True) as r:
+    with SESSION.get(post["video_url"], stream=True) as r:
         r.raise_for_status()
-        with open(video_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+        r.raw.decode_content = True
+        with open(video_path, "wb", buffering=0) as f:
+            shutil.copyfileobj(r.raw, f, CHUNK_SIZE)
 
     metadata = {
-        "username": post.owner_username,
-        "caption": post.caption,
-        "likes": post.likes,
-        "comments": post.comments,
+        "username": post["username"],
+        "caption": post["caption"],
+        "likes": post["likes"],
+        "comments": post["comments"],
         "url": url,
     }
 
@@ -189,20 +246,7 @@ def download_video(url: str):
         return download_youtube(url)
 
     elif platform == "instagram":
-        USERNAME = os.getenv("INSTA_USERNAME")
-        PASSWORD = os.getenv("INSTA_PASSWORD")
-        L = None
-        if USERNAME and PASSWORD:
-            L = instaloader.Instaloader(
-                download_pictures=False,
-                download_videos=False,
-                download_video_thumbnails=False,
-                download_geotags=False,
-                download_comments=False,
-                save_metadata=False
-            )
-            L.login(USERNAME, PASSWORD)
-        return download_instagram(url, L=L)
+        return download_instagram(url)
 
 # -----------------------------
 # Main
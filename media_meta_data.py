@@ -1,30 +1,57 @@
 import json
 import os
 import re
-from urllib.parse import urlparse
 import time
+from collections import defaultdict
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import diskcache
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
+from utils import detect_platform, make_session, parse_og_tags
 
 load_dotenv()
 
+# ==================== HTTP SESSION ====================
+SESSION = make_session()
+
+# ==================== RATE LIMITING ====================
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` calls per second, bursting up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve a token; if the bucket is empty, wait until it refills.
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+TIKTOK_LIMITER = RateLimiter(rate=1)  # oEmbed: 1 request/second
+INSTAGRAM_LIMITER = RateLimiter(rate=2, burst=4)
+
+
 # ==================== INSTAGRAM META ====================
 def fetch_instagram_meta(url):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
+    INSTAGRAM_LIMITER.acquire()
     try:
-        r = requests.get(url, headers=headers, timeout=10)
+        r = SESSION.get(url, timeout=10)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        def og(prop):
-            tag = soup.find("meta", {"property": prop})
-            return tag["content"].strip() if tag and tag.get("content") else None
+        og = parse_og_tags(r.content).get
 
         desc = og("og:description")
         image = og("og:image")
@@ -40,9 +67,11 @@ def fetch_instagram_meta(url):
 
 
 # ==================== YOUTUBE DURATION ====================
+YT_DURATION_RE = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
+
 def parse_youtube_duration_short(duration):
-    pattern = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
-    match = pattern.fullmatch(duration)
+    match = YT_DURATION_RE.fullmatch(duration or "")
     if not match:
         return None
     hours = int(match.group(1)) if match.group(1) else 0
@@ -55,14 +84,11 @@ def parse_youtube_duration_short(duration):
 def fetch_tiktok_reel_metadata(reel_url):
     oembed_endpoint = "https://www.tiktok.com/oembed"
     params = {"url": reel_url}
-    time.sleep(3)
+    TIKTOK_LIMITER.acquire()
     try:
-        response = requests.get(oembed_endpoint, params=params)
+        response = SESSION.get(oembed_endpoint, params=params)
         response.raise_for_status()
         data = response.json()
-        html = data.get("html", "")
-        soup = BeautifulSoup(html, "html.parser")
-
         result = {
             "Title / Headline": data.get("title"),
             "Creator / Channel": data.get("author_url"),
@@ -75,138 +101,331 @@ def fetch_tiktok_reel_metadata(reel_url):
 
 
 # ==================== YOUTUBE API ====================
+YT_ID_RE = re.compile(r"(?:v=|/v/|youtu\.be/|shorts/)([A-Za-z0-9_-]{11})")
+
+
 def extract_video_id(url):
-    patterns = [r"(?:v=|/v/|youtu\.be/|shorts/)([A-Za-z0-9_-]{11})"]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
+    match = YT_ID_RE.search(url)
+    return match.group(1) if match else None
 
 
 API_KEY = os.getenv("YOUTUBE_DATA_API")
 INPUT_CSV = "WHATSAPP_AI_Video_Library_2025-10-12.csv"
 OUTPUT_CSV = "YouTube_Metadata_Output.csv"
 TEMP_CSV = "temp.csv"
-
-youtube = build("youtube", "v3", developerKey=API_KEY)
+# Each platform gets its own pool so a slow scraper never starves the others.
+# YouTube is fetched as a single batched job, so one worker is enough.
+PLATFORM_WORKERS = {"youtube": 1, "instagram": 4, "tiktok": 2}
+YOUTUBE_BATCH_SIZE = 50  # max ids per videos.list / channels.list call
+META_CACHE_DIR = ".meta_cache"
+META_CACHE_TTL = 30 * 86400  # seconds to keep successful lookups
+META_CACHE_NEGATIVE_TTL = 3600  # seconds to remember failed lookups
+CHECKPOINT_EVERY = 50  # rewrite TEMP_CSV after this many successful rows
+
+# Fixed column order of the rows produced by youtube_row().
+YOUTUBE_COLUMNS = [
+    "Title / Headline",
+    "Description / Summary",
+    "Creator / Channel",
+    "Publish Date",
+    "Thumbnail Url",
+    "Language",
+    "Duration",
+    "Followers / Subscribers",
+]
+
+# Union of keys returned by the platform fetchers, added to the frame up front.
+# TikTok's keys are a subset of YOUTUBE_COLUMNS.
+METADATA_COLUMNS = ["url", "description", "thumbnail", *YOUTUBE_COLUMNS]
+
+# ==================== METADATA CACHE ====================
+# Keyed by (platform, video_id_or_url); shared safely across worker threads.
+META_CACHE = diskcache.Cache(META_CACHE_DIR)
+CACHE_MISS = object()
+
+
+def cached_fetch(platform, key, fetch, is_valid=bool):
+    """Return fetch(key), served from META_CACHE when a fresh entry exists."""
+    result = META_CACHE.get((platform, key), default=CACHE_MISS)
+    if result is not CACHE_MISS:
+        return result
+    result = fetch(key)
+    expire = META_CACHE_TTL if is_valid(result) else META_CACHE_NEGATIVE_TTL
+    META_CACHE.set((platform, key), result, expire=expire)
+    return result
+
+
+# googleapiclient's httplib2 transport is not thread-safe, so each worker
+# thread gets its own client.
+_thread_local = threading.local()
+
+
+def get_youtube():
+    if not hasattr(_thread_local, "youtube"):
+        # Skip the discovery-cache lookup when building each client.
+        _thread_local.youtube = build(
+            "youtube", "v3", developerKey=API_KEY, cache_discovery=False,
+        )
+    return _thread_local.youtube
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_channel_statistics(channel_ids):
+    """Return {channel_id: subscriberCount}, 50 channels per channels.list call.
+
+    Counts are kept in META_CACHE for META_CACHE_TTL; channels the API does
+    not return are cached as None so they are not requested every run.
+    Channels whose lookup failed are left out of the result.
+    """
+    subscribers = {}
+    missing = []
+    for channel_id in dict.fromkeys(channel_ids):
+        cached = META_CACHE.get(("channel", channel_id), default=CACHE_MISS)
+        if cached is CACHE_MISS:
+            missing.append(channel_id)
+        else:
+            subscribers[channel_id] = cached
+    for chunk in chunked(missing, YOUTUBE_BATCH_SIZE):
+        request = get_youtube().channels().list(part="statistics", id=",".join(chunk))
+        try:
+            response = request.execute(num_retries=3)
+        except HttpError as e:
+            print(f"❌ channels.list failed for {len(chunk)} channels: {e}")
+            continue
+        found = {
+            item["id"]: item.get("statistics", {}).get("subscriberCount")
+            for item in response.get("items", [])
+        }
+        for channel_id in chunk:
+            subscribers[channel_id] = found.get(channel_id)
+            META_CACHE.set(("channel", channel_id), subscribers[channel_id], expire=META_CACHE_TTL)
+    return subscribers
 
 
-def get_channel_statistics(channel_id):
-    request = youtube.channels().list(part="snippet,statistics", id=channel_id)
-    response = request.execute()
-    if not response.get("items"):
-        return None
-    stats = response["items"][0]["statistics"]
-    return stats.get("subscriberCount")
+# Cache entries are tuples in YOUTUBE_COLUMNS order; bump the namespace when
+# that shape changes so stale entries are never read back.
+YOUTUBE_CACHE_NAMESPACE = "youtube-v2"
 
 
-def fetch_video_data(video_id):
-    time.sleep(2)
-    request = youtube.videos().list(
-        part="snippet,statistics,contentDetails,status,topicDetails,recordingDetails",
-        id=video_id
-    )
-    response = request.execute()
-    if not response.get("items"):
-        print(f"not fetched.")
-        return None
-    print(f"fetched.")
-    item = response["items"][0]
+def youtube_row(item, subscribers):
+    """Return one videos.list item as a tuple in YOUTUBE_COLUMNS order."""
     snippet = item.get("snippet", {})
     content = item.get("contentDetails", {})
-    subsribers = get_channel_statistics(snippet.get("channelId"))
-    return {
-        "Title / Headline": snippet.get("title"),
-        "Description / Summary": snippet.get("description"),
-        "Creator / Channel": f"https://www.youtube.com/channel/{snippet.get('channelId')}",
-        "Publish Date": snippet.get("publishedAt").split("T")[0] if snippet.get("publishedAt") else None,
-        "Thumbnail Url": snippet.get("thumbnails", {}).get("default", {}).get("url"),
-        "Language": snippet.get("defaultAudioLanguage"),
-        "Duration": parse_youtube_duration_short(content.get("duration")),
-        "Followers / Subscribers": subsribers,
-    }
-
-
-# ==================== PLATFORM DETECTION ====================
-def detect_platform(url: str) -> str:
-    url = url.strip()
-    if not url:
-        return "unknown"
-    domain = urlparse(url).netloc.lower()
-    if re.search(r"(youtube\.com|youtu\.be)$", domain):
-        return "youtube"
-    if re.search(r"(tiktok\.com)$", domain):
-        return "tiktok"
-    if re.search(r"(instagram\.com)$", domain):
-        return "instagram"
-    return "unknown"
-
-
-def download_metadata(row_num: int, url: str):
+    return (
+        snippet.get("title"),
+        snippet.get("description"),
+        f"https://www.youtube.com/channel/{snippet.get('channelId')}",
+        snippet.get("publishedAt").split("T")[0] if snippet.get("publishedAt") else None,
+        snippet.get("thumbnails", {}).get("default", {}).get("url"),
+        snippet.get("defaultAudioLanguage"),
+        parse_youtube_duration_short(content.get("duration")),
+        subscribers.get(snippet.get("channelId")),
+    )
+
+
+def fetch_video_data(video_ids):
+    """Return a DataFrame of YOUTUBE_COLUMNS indexed by video_id.
+
+    Videos are fetched 50 per videos.list call; videos already in META_CACHE
+    are served from it and only the rest hit the API. Unavailable videos are
+    left out of the frame.
+    """
+    video_ids = list(dict.fromkeys(v for v in video_ids if v))
+    rows = {}
+    missing = []
+    for video_id in video_ids:
+        cached = META_CACHE.get((YOUTUBE_CACHE_NAMESPACE, video_id), default=CACHE_MISS)
+        if cached is CACHE_MISS:
+            missing.append(video_id)
+        elif cached:
+            rows[video_id] = cached
+    print(f"💾 {len(video_ids) - len(missing)} YouTube videos served from cache.")
+
+    # Each chunk is cached as soon as it returns, so one failed call only
+    # loses its own videos.
+    fetched = 0
+    for chunk in chunked(missing, YOUTUBE_BATCH_SIZE):
+        request = get_youtube().videos().list(
+            part="snippet,statistics,contentDetails,status,topicDetails,recordingDetails",
+            id=",".join(chunk)
+        )
+        try:
+            response = request.execute(num_retries=3)
+        except HttpError as e:
+            print(f"❌ videos.list failed for {len(chunk)} videos: {e}")
+            continue
+        items = response.get("items", [])
+        fetched += len(items)
+
+        channel_ids = {item.get("snippet", {}).get("channelId") for item in items}
+        subscribers = get_channel_statistics(c for c in channel_ids if c)
+        for item in items:
+            rows[item["id"]] = youtube_row(item, subscribers)
+
+        # Rows whose channel lookup failed are kept only briefly so the
+        # subscriber count is retried soon.
+        incomplete = {
+            item["id"] for item in items
+            if item.get("snippet", {}).get("channelId") not in subscribers
+        }
+        for video_id in chunk:
+            row = rows.get(video_id)
+            expire = META_CACHE_TTL if row and video_id not in incomplete else META_CACHE_NEGATIVE_TTL
+            META_CACHE.set((YOUTUBE_CACHE_NAMESPACE, video_id), row, expire=expire)
+    print(f"🎥 Fetched {fetched}/{len(missing)} YouTube videos.")
+
+    # Build the frame column-wise in one shot rather than from per-video dicts.
+    cols = defaultdict(list)
+    for row in rows.values():
+        for column, value in zip(YOUTUBE_COLUMNS, row):
+            cols[column].append(value)
+    return pd.DataFrame(cols, index=pd.Index(list(rows), name="video_id"), columns=YOUTUBE_COLUMNS)
+
+
+def download_metadata(url: str):
     platform = detect_platform(url)
-    if platform == "unknown":
-        print("❌ Could not detect platform from URL.")
-        return
-    if platform == "youtube":
-        return fetch_video_data(extract_video_id(url))
     if platform == "tiktok":
-        return fetch_tiktok_reel_metadata(url)
+        return cached_fetch("tiktok", url, fetch_tiktok_reel_metadata)
     if platform == "instagram":
-        return fetch_instagram_meta(url)
-    print(f"Detected platform: {platform}")
+        return cached_fetch(
+            "instagram", url, fetch_instagram_meta,
+            is_valid=lambda r: bool(r["description"] or r["thumbnail"]),
+        )
+    print(f"❌ Unsupported platform for {url}: {platform}")
+
+
+def merge_records(df, records):
+    """Write a batch of {"idx": row_index, column: value} records into df at once."""
+    if not records:
+        return
+    new_df = pd.DataFrame(records).set_index("idx")
+    # df.update ignores unknown columns, so add any key not declared up front.
+    for key in new_df.columns.difference(df.columns):
+        df[key] = None
+        print(f"➕ Added new column: '{key}'")
+    df.update(new_df)
+
+
+def merge_youtube(df, youtube_rows, youtube_df):
+    """Join fetched YouTube columns onto df by video id in one step.
+
+    youtube_rows maps df row index -> video_id. Returns the row indexes filled.
+    """
+    video_ids = pd.Series(youtube_rows, dtype=object)
+    matched = video_ids[video_ids.isin(youtube_df.index)]
+    if not matched.empty:
+        df.update(youtube_df.loc[matched.values].set_axis(matched.index))
+    return set(matched.index)
 
 
 # ==================== MAIN LOOP ====================
 try:
-    df = pd.read_csv(INPUT_CSV, encoding="utf-8")
-    df = df.astype(str)
-    
-    df.replace(r'^\s*nan\s*$', '', regex=True, inplace=True)
+    # Load every column as text with empty cells kept as "" (no NaN conversion).
+    df = pd.read_csv(INPUT_CSV, encoding="utf-8", dtype=str, keep_default_na=False, na_filter=False)
+
+    # Clear literal "nan" text left by older runs (exact-match lookup, no regex).
+    df.replace({"nan": "", "NaN": ""}, inplace=True)
     print(f"📊 Loaded {len(df)} records from CSV")
     print(f"Columns: {list(df.columns)}")
 
+    for key in METADATA_COLUMNS:
+        if key not in df.columns:
+            df[key] = None
+            print(f"➕ Added new column: '{key}'")
+
     # ✅ Create temp CSV at the start
     df.to_csv(TEMP_CSV, index=False, encoding="utf-8")
     print(f"🗂️ Created live temp CSV: {TEMP_CSV}")
 
     success_count = 0
     skipped_error_count = 0  # merged counter
+    pending = []  # fetched records not yet merged into df
 
+    rows = []
     for idx, row in df.iterrows():
-        try:
-            url = str(row.get("URL / Media", "")).strip()
-            if not url or url == "nan":
-                print(f"⚠️ Record {idx + 1}: Missing URL, skipping.")
-                skipped_error_count += 1
+        url = str(row.get("URL / Media", "")).strip()
+        if not url or url == "nan":
+            print(f"⚠️ Record {idx + 1}: Missing URL, skipping.")
+            skipped_error_count += 1
+            continue
+        platform = detect_platform(url)
+        if platform == "unknown":
+            print(f"❌ Record {idx + 1}: Could not detect platform from URL.")
+            skipped_error_count += 1
+            continue
+        rows.append((idx, url, platform))
+
+    # Fetch metadata concurrently, one pool per platform; results are merged
+    # into df on the main thread.
+    pools = {platform: ThreadPoolExecutor(max_workers=n) for platform, n in PLATFORM_WORKERS.items()}
+    try:
+        # YouTube rows are fetched as one batched job and merged column-wise.
+        youtube_rows = {idx: extract_video_id(url) for idx, url, platform in rows if platform == "youtube"}
+        youtube_future = pools["youtube"].submit(fetch_video_data, list(youtube_rows.values()))
+
+        futures = {youtube_future: None}
+        for idx, url, platform in rows:
+            if platform != "youtube":
+                futures[pools[platform].submit(download_metadata, url)] = idx
+
+        for future in as_completed(futures):
+            if future is youtube_future:
+                try:
+                    filled = merge_youtube(df, youtube_rows, future.result())
+                except Exception as e:
+                    print(f"❌ YouTube batch failed: {e}")
+                    filled = set()
+                for idx in youtube_rows:
+                    if idx in filled:
+                        print(f"✅ Record {idx + 1}: Added YouTube metadata")
+                    else:
+                        print(f"❌ Record {idx + 1}: Failed to fetch metadata.")
+                success_count += len(filled)
+                skipped_error_count += len(youtube_rows) - len(filled)
                 continue
 
-            results = download_metadata(idx + 1, url)
-            if results:
-                for key, value in results.items():
-                    if key not in df.columns:
-                        df[key] = None
-                        print(f"➕ Added new column: '{key}'")
-                    # replace any nan-like values with empty strings
-                    if isinstance(value, float) and pd.isna(value):
-                        value = ""
-                    elif isinstance(value, str) and value.lower() == "nan":
-                        value = ""
-                    df.at[idx, key] = value
-                    print(f"✅ Record {idx + 1}: Added '{key}'")
-
-                success_count += 1
-
-                # ✅ Write to CSV live
-                df.to_csv(TEMP_CSV, index=False, encoding="utf-8")
-
-            else:
+            idx = futures[future]
+            try:
+                results = future.result()
+                if results:
+                    record = {"idx": idx}
+                    for key, value in results.items():
+                        # replace any nan-like values with empty strings
+                        if isinstance(value, float) and pd.isna(value):
+                            value = ""
+                        elif isinstance(value, str) and value.lower() == "nan":
+                            value = ""
+                        record[key] = value
+                    pending.append(record)
+                    print(f"✅ Record {idx + 1}: Added {', '.join(repr(k) for k in results)}")
+
+                    success_count += 1
+
+                    # ✅ Checkpoint progress without rewriting the CSV on every row
+                    if success_count % CHECKPOINT_EVERY == 0:
+                        merge_records(df, pending)
+                        pending.clear()
+                        df.to_csv(TEMP_CSV, index=False, encoding="utf-8")
+
+                else:
+                    skipped_error_count += 1
+                    print(f"❌ Record {idx + 1}: Failed to fetch metadata.")
+
+            except Exception as e:
+                print(f"❌ Record {idx + 1}: Error: {e}")
                 skipped_error_count += 1
-                print(f"❌ Record {idx + 1}: Failed to fetch metadata.")
+    finally:
+        # On normal exit every future is done; on Ctrl-C or an error, drop the
+        # queued fetches instead of waiting for them to run.
+        for pool in pools.values():
+            pool.shutdown(cancel_futures=True)
 
-        except Exception as e:
-            print(f"❌ Record {idx + 1}: Error: {e}")
-            skipped_error_count += 1
+    merge_records(df, pending)
+    df.to_csv(TEMP_CSV, index=False, encoding="utf-8")
 
     # Replace old file with temp
     os.replace(TEMP_CSV, INPUT_CSV)
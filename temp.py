@@ -1,26 +1,20 @@
 import csv
-import requests
-from bs4 import BeautifulSoup
 from time import sleep 
 import os
+from utils import make_session, parse_og_tags
 
 INPUT_CSV = "WHATSAPP_AI_Video_Library_2025-10-12.csv"
 OUTPUT_CSV = "Instagram_Metadata.csv"
 
+# --- Shared HTTP session (keep-alive + retries) ---
+SESSION = make_session()
+
 def fetch_instagram_meta(url):
     """Scrape Instagram Open Graph tags (no API)"""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
     try:
-        r = requests.get(url, headers=headers, timeout=10)
+        r = SESSION.get(url, timeout=10)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        def og(prop):
-            tag = soup.find("meta", {"property": prop})
-            return tag["content"].strip() if tag and tag.get("content") else None
+        og = parse_og_tags(r.content).get
 
         title = og("og:title")
         desc = og("og:description")
@@ -31,6 +25,7 @@ def fetch_instagram_meta(url):
 
         return {
             "url": url,
+            "title": title or "",
             "description": desc or "",
             "thumbnail": image or "",
         }
@@ -38,6 +33,7 @@ def fetch_instagram_meta(url):
         # Return empty fields on error
         return {
             "url": url,
+            "title": "",
             "description": "",
             "thumbnail": "",
         }
@@ -52,7 +48,7 @@ with open(INPUT_CSV, "r", encoding="utf-8") as f:
 
 print(f"Found {len(instagram_links)} Instagram links.")
 
-# --- Step 2: Prepare output CSV (create header if not exists) ---
+# --- Step 2 & 3: Open the output CSV once, then scrape each link and append ---
 file_exists = os.path.exists(OUTPUT_CSV)
 with open(OUTPUT_CSV, "a", newline="", encoding="utf-8") as f:
     fieldnames = ["url", "title", "description", "thumbnail"]
@@ -60,20 +56,18 @@ with open(OUTPUT_CSV, "a", newline="", encoding="utf-8") as f:
     if not file_exists:
         writer.writeheader()
 
-# --- Step 3: Scrape each and append immediately ---
-for i, link in enumerate(instagram_links, start=1):
-    print(f"[{i}/{len(instagram_links)}] Scraping: {link}")
-    data = fetch_instagram_meta(link)
+    for i, link in enumerate(instagram_links, start=1):
+        print(f"[{i}/{len(instagram_links)}] Scraping: {link}")
+        data = fetch_instagram_meta(link)
 
-    # Append immediately to CSV
-    with open(OUTPUT_CSV, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["url", "description", "thumbnail"])
+        # Append to CSV; flush so progress survives an interrupted run
         writer.writerow(data)
+        f.flush()
 
-    # Safe print preview
-    title_preview = (data["title"] or "No title")[:60]
-    print(f"✅ Saved: {title_preview}")
+        # Safe print preview
+        title_preview = (data["title"] or "No title")[:60]
+        print(f"✅ Saved: {title_preview}")
 
-    sleep(2)  # polite delay
+        sleep(2)  # polite delay
 
 print(f"\n✅ Done! Appended metadata to {OUTPUT_CSV}")
\ No newline at end of file
@@ -0,0 +1,63 @@
+import html
+import re
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# -----------------------------
+# Shared Helper Functions
+# -----------------------------
+
+INVALID_FILENAME_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
+# (domain suffixes, platform) pairs checked in order against the URL's netloc.
+PLATFORM_DOMAINS = (
+    (("youtube.com", "youtu.be"), "youtube"),
+    (("tiktok.com",), "tiktok"),
+    (("instagram.com",), "instagram"),
+)
+
+# Matches <meta property="og:..." content="..."> on the raw response bytes.
+OG_META_RE = re.compile(rb'<meta\s+property="(og:[^"]+)"\s+content="([^"]*)"')
+
+def make_session() -> requests.Session:
+    """Session with pooled keep-alive connections, retries, and browser-like headers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+        "Accept-Language": "en-US,en;q=0.9",
+    })
+    return session
+
+def sanitize_filename(s: str) -> str:
+    """Replace invalid Windows filename characters with underscore."""
+    return INVALID_FILENAME_CHARS_RE.sub('_', s)
+
+def detect_platform(url: str) -> str:
+    """Detect platform from URL: YouTube, TikTok, Instagram, or unknown."""
+    url = url.strip()
+    if not url:
+        return "unknown"
+
+    domain = urlparse(url).netloc.lower()
+
+    for suffixes, platform in PLATFORM_DOMAINS:
+        if domain.endswith(suffixes):
+            return platform
+    return "unknown"
+
+def parse_og_tags(content: bytes) -> dict:
+    """Return {og:property: content} for the first occurrence of each tag."""
+    tags = {}
+    for match in OG_META_RE.finditer(content):
+        prop = match.group(1).decode("ascii", "replace")
+        if prop not in tags:
+            tags[prop] = html.unescape(match.group(2).decode("utf-8", "replace")).strip()
+    return tags
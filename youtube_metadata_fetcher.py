@@ -9,19 +9,18 @@ load_dotenv()
 API_KEY = os.getenv("YOUTUBE_DATA_API") 
 INPUT_CSV = "WHATSAPP_AI_Video_Library_2025-10-12.csv"
 OUTPUT_CSV = "YouTube_Metadata_Output.csv"
+BATCH_SIZE = 50  # max ids per videos.list call
 
-youtube = build("youtube", "v3", developerKey=API_KEY)
+# Skip the discovery-cache lookup when building the client.
+youtube = build("youtube", "v3", developerKey=API_KEY, cache_discovery=False)
+
+
+YT_ID_RE = re.compile(r"(?:v=|/v/|youtu\.be/|shorts/)([A-Za-z0-9_-]{11})")
 
 
 def extract_video_id(url):
-    patterns = [
-        r"(?:v=|/v/|youtu\.be/|shorts/)([A-Za-z0-9_-]{11})",
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
+    match = YT_ID_RE.search(url)
+    return match.group(1) if match else None
 
 
 def get_all_categories():
@@ -40,17 +39,23 @@ def get_all_categories():
     return category_map
 
 
-def fetch_video_data(video_id, category_map):
-    request = youtube.videos().list(
-        part="snippet,statistics,contentDetails,status,topicDetails,recordingDetails",
-        id=video_id
-    )
-    response = request.execute()
+def fetch_video_items(video_ids):
+    """Return {video_id: videos.list item}, BATCH_SIZE ids per request."""
+    video_ids = list(dict.fromkeys(video_ids))
+    items = {}
+    for i in range(0, len(video_ids), BATCH_SIZE):
+        request = youtube.videos().list(
+            part="snippet,statistics,contentDetails,status,topicDetails,recordingDetails",
+            id=",".join(video_ids[i:i + BATCH_SIZE])
+        )
+        response = request.execute()
+        for item in response.get("items", []):
+            items[item["id"]] = item
+    return items
 
-    if not response.get("items"):
-        return None
 
-    item = response["items"][0]
+def video_record(item, category_map):
+    video_id = item["id"]
     snippet = item.get("snippet", {})
     stats = item.get("statistics", {})
     content = item.get("contentDetails", {})
@@ -107,17 +112,20 @@ def main():
     category_map = get_all_categories()
     print(f"✅ Loaded {len(category_map)} categories.\n")
 
+    video_ids = []
     with open(INPUT_CSV, newline='', encoding="utf-8") as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
             if row["Platform"].lower() == "youtube":
-                url = row["URL / Media"]
-                video_id = extract_video_id(url)
+                video_id = extract_video_id(row["URL / Media"])
                 if video_id:
-                    print(f"🎥 Fetching data for video: {video_id}")
-                    data = fetch_video_data(video_id, category_map)
-                    if data:
-                        results.append(data)
+                    video_ids.append(video_id)
+
+    print(f"🎥 Fetching data for {len(video_ids)} videos...")
+    items = fetch_video_items(video_ids)
+    for video_id in video_ids:
+        if video_id in items:
+            results.append(video_record(items[video_id], category_map))
 
     if results:
         with open(OUTPUT_CSV, "w", newline='', encoding="utf-8") as csvfile: